@@ -16,6 +16,8 @@ class AutoRetrainSystem {
             retrainInterval: config.retrainInterval || '0 2 * * *', 
             pythonPath: config.pythonPath || 'python',
             scriptPath: config.scriptPath || './retrain_model.py',
+            runnerPath: config.runnerPath || './retrain_runner.py',
+            metadataFile: config.metadataFile || './model_metadata.json',
             trainingDataFile: config.trainingDataFile || './ai_training_data.csv',
             autoReload: config.autoReload !== false,        
             modelPath: config.modelPath || './models/plant-model',
@@ -23,7 +25,8 @@ class AutoRetrainSystem {
         };
 
         // State
-        this.isTraining = false;
+        // Concurrent runs are coalesced by retrain_runner.py, so this only tracks them
+        this.activeRuns = 0;
         this.lastTrainingTime = null;
         this.trainingHistory = [];
         this.scheduledJob = null;
@@ -100,12 +103,6 @@ class AutoRetrainSystem {
         console.log('='.repeat(60));
         console.log(`⏰ Time: ${new Date().toLocaleString()}`);
 
-        // Check if already training
-        if (this.isTraining) {
-            console.log('⚠️  Training already in progress. Skipping.');
-            return { success: false, reason: 'already_training' };
-        }
-
         // Check if enough samples
         const sampleCount = this.countTrainingSamples();
         console.log(`📊 Current training samples: ${sampleCount}`);
@@ -148,22 +145,21 @@ class AutoRetrainSystem {
      */
     async forceRetrain() {
         console.log('\n🚀 MANUAL RETRAIN TRIGGERED');
-        
-        if (this.isTraining) {
-            throw new Error('Training already in progress');
-        }
 
-        return await this.retrain();
+        // If a run is already active, the runner attaches this request to it
+        return await this.retrain('manual');
     }
 
     /**
      * Get training statistics
      */
     getStats() {
-        const successful = this.trainingHistory.filter(t => t.success).length;
-        const failed = this.trainingHistory.filter(t => !t.success).length;
+        // Requests coalesced into another job are not separate trainings
+        const runs = this.trainingHistory.filter(t => !t.coalesced_into);
+        const successful = runs.filter(t => t.success).length;
+        const failed = runs.filter(t => !t.success).length;
         
-        const accuracies = this.trainingHistory
+        const accuracies = runs
             .filter(t => t.success && t.accuracy !== null)
             .map(t => t.accuracy);
         
@@ -171,14 +167,14 @@ class AutoRetrainSystem {
             ? accuracies.reduce((a, b) => a + b) / accuracies.length 
             : null;
 
-        const lastTraining = this.trainingHistory.length > 0
-            ? this.trainingHistory[this.trainingHistory.length - 1]
+        const lastTraining = runs.length > 0
+            ? runs[runs.length - 1]
             : null;
 
         return {
             enabled: this.config.enabled,
-            is_training: this.isTraining,
-            total_trainings: this.trainingHistory.length,
+            is_training: this.activeRuns > 0,
+            total_trainings: runs.length,
             successful_trainings: successful,
             failed_trainings: failed,
             average_accuracy: avgAccuracy ? avgAccuracy.toFixed(4) : null,
@@ -226,10 +222,12 @@ class AutoRetrainSystem {
 
     /**
      * Execute Python retraining script
+     * Runs through retrain_runner.py, which applies CPU/memory limits and
+     * merges overlapping manual + scheduled requests into a single run.
      */
-    async retrain() {
+    async retrain(trigger = 'auto') {
         return new Promise((resolve, reject) => {
-            this.isTraining = true;
+            this.activeRuns++;
             const startTime = Date.now();
 
             console.log('🎓 Starting Model Retraining...');
@@ -237,7 +235,11 @@ class AutoRetrainSystem {
             console.log('-'.repeat(60));
 
             // Spawn Python process
-            const pythonProcess = spawn(this.config.pythonPath, [this.config.scriptPath], {
+            const pythonProcess = spawn(this.config.pythonPath, [
+                this.config.runnerPath, 'submit',
+                '--trigger', trigger,
+                '--script', this.config.scriptPath
+            ], {
                 cwd: process.cwd(),
                 env: process.env
             });
@@ -262,20 +264,32 @@ class AutoRetrainSystem {
             // Handle completion
             pythonProcess.on('close', async (code) => {
                 const duration = ((Date.now() - startTime) / 1000).toFixed(1);
-                this.isTraining = false;
+                this.activeRuns--;
+
+                // Only the request that owns the job records it and reloads the model
+                const job = this.parseJobMarker(output);
+                const coalescedInto = job && job.role === 'attached' ? job.jobId : null;
 
                 console.log('-'.repeat(60));
 
                 if (code === 0) {
-                    console.log(`✅ Retraining completed successfully in ${duration}s`);
+                    console.log(coalescedInto
+                        ? `✅ Retraining completed (request coalesced into job ${coalescedInto})`
+                        : `✅ Retraining completed successfully in ${duration}s`);
                     
                     this.lastTrainingTime = Date.now();
                     
-                    // Parse metrics from output
-                    const metrics = this.parseTrainingOutput(output);
+                    // A request attached to another job prints no training output,
+                    // so prefer the metadata the finished run wrote
+                    const metrics = this.readMetadataMetrics(startTime) || this.parseTrainingOutput(output);
 
                     // Record training history
-                    const trainingRecord = {
+                    const trainingRecord = coalescedInto ? {
+                        timestamp: new Date().toISOString(),
+                        success: true,
+                        trigger: trigger,
+                        coalesced_into: coalescedInto
+                    } : {
                         timestamp: new Date().toISOString(),
                         duration_seconds: parseFloat(duration),
                         success: true,
@@ -283,14 +297,15 @@ class AutoRetrainSystem {
                         precision: metrics.precision,
                         recall: metrics.recall,
                         samples_used: this.countTrainingSamples(),
-                        trigger: 'auto'
+                        trigger: trigger,
+                        job_id: job ? job.jobId : null
                     };
 
                     this.trainingHistory.push(trainingRecord);
                     this.saveTrainingHistory();
 
                     // Auto-reload model if enabled
-                    if (this.config.autoReload) {
+                    if (this.config.autoReload && !coalescedInto) {
                         console.log('🔄 Reloading model...');
                         await this.reloadModel();
                     }
@@ -301,7 +316,10 @@ class AutoRetrainSystem {
                         success: true,
                         duration: parseFloat(duration),
                         metrics: metrics,
-                        message: 'Model retrained successfully'
+                        coalesced_into: coalescedInto,
+                        message: coalescedInto
+                            ? `Request coalesced into job ${coalescedInto}`
+                            : 'Model retrained successfully'
                     });
 
                 } else {
@@ -314,7 +332,8 @@ class AutoRetrainSystem {
                         success: false,
                         error: errorOutput,
                         exit_code: code,
-                        trigger: 'auto'
+                        trigger: trigger,
+                        ...(coalescedInto ? { coalesced_into: coalescedInto } : { job_id: job ? job.jobId : null })
                     };
 
                     this.trainingHistory.push(trainingRecord);
@@ -333,7 +352,7 @@ class AutoRetrainSystem {
 
             // Handle errors
             pythonProcess.on('error', (error) => {
-                this.isTraining = false;
+                this.activeRuns--;
                 console.error('❌ Failed to start Python process:', error.message);
                 console.log('='.repeat(60) + '\n');
                 
@@ -346,6 +365,39 @@ class AutoRetrainSystem {
         });
     }
 
+    /**
+     * Read metrics from model_metadata.json if it was written by a run
+     * that finished after `since` (ms timestamp)
+     */
+    readMetadataMetrics(since) {
+        try {
+            if (!fs.existsSync(this.config.metadataFile)) {
+                return null;
+            }
+            if (fs.statSync(this.config.metadataFile).mtimeMs < since) {
+                return null;
+            }
+            const metadata = JSON.parse(fs.readFileSync(this.config.metadataFile, 'utf8'));
+            return {
+                accuracy: metadata.accuracy ?? null,
+                precision: metadata.precision ?? null,
+                recall: metadata.recall ?? null,
+                f1_score: metadata.f1_score ?? null
+            };
+        } catch (error) {
+            console.error('❌ Failed to read model metadata:', error.message);
+            return null;
+        }
+    }
+
+    /**
+     * Find the RETRAIN_JOB line retrain_runner.py prints for every request
+     */
+    parseJobMarker(output) {
+        const match = output.match(/RETRAIN_JOB job_id=(\w+) role=(owner|attached)/);
+        return match ? { jobId: match[1], role: match[2] } : null;
+    }
+
     /**
      * Parse training output for metrics
      */
@@ -409,7 +461,7 @@ class AutoRetrainSystem {
             const historyFile = path.join(__dirname, 'training_history.json');
             const data = {
                 last_updated: new Date().toISOString(),
-                total_trainings: this.trainingHistory.length,
+                total_trainings: this.trainingHistory.filter(t => !t.coalesced_into).length,
                 history: this.trainingHistory
             };
             fs.writeFileSync(historyFile, JSON.stringify(data, null, 2));
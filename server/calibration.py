@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# ============================================
+# CALIBRATION.PY
+# Probability Calibration & Operating-Point Thresholds
+# ============================================
+#
+# Shared by retrain_model.py and smart-plant-ml/train_model.py. Fits a
+# Platt or isotonic calibrator on held-out model scores, sweeps every
+# distinct threshold once (vectorized ROC/PR curve) and picks a threshold
+# per operating point. Thresholds are exported in raw model-score space,
+# so the server only compares `score > threshold` - no extra inference.
+#
+# Environment variables:
+#   PLANT_CALIBRATION              - 'platt' (default), 'isotonic' or 'none'
+#   PLANT_OPERATING_POINTS         - comma list, default 'recall@0.95,f1'
+#                                    (recall@R, precision@P, f1, youden)
+#   PLANT_DEFAULT_OPERATING_POINT  - which point becomes 'threshold'
+#                                    (default: the first one listed)
+
+import os
+
+import numpy as np
+
+DEFAULT_OPERATING_POINTS = 'recall@0.95,f1'
+CALIBRATION_METHODS = ('platt', 'isotonic', 'none')
+
+# Below this many held-out samples of either class a single sample decides
+# the threshold (recall@0.95 on 3 negatives is "catch every positive"), so
+# 0.5 is kept instead
+MIN_CLASS_SAMPLES = 10
+
+_EPS = 1e-7
+
+
+def calibration_config_from_env():
+    method = os.environ.get('PLANT_CALIBRATION', 'platt').strip().lower()
+    if method not in CALIBRATION_METHODS:
+        raise ValueError(f"PLANT_CALIBRATION must be one of {CALIBRATION_METHODS}, got {method!r}")
+
+    specs = [s.strip() for s in os.environ.get('PLANT_OPERATING_POINTS', DEFAULT_OPERATING_POINTS).split(',') if s.strip()]
+    for spec in specs:
+        parse_operating_point(spec)
+
+    default = os.environ.get('PLANT_DEFAULT_OPERATING_POINT', specs[0] if specs else '').strip()
+    if specs and default not in specs:
+        raise ValueError(f"PLANT_DEFAULT_OPERATING_POINT {default!r} is not in {specs}")
+
+    return method, specs, default
+
+
+def parse_operating_point(spec):
+    """'recall@0.95' -> ('recall', 0.95); 'f1' -> ('f1', None)."""
+    name, _, target = spec.partition('@')
+    if name in ('recall', 'precision'):
+        value = float(target)
+        if not 0.0 < value <= 1.0:
+            raise ValueError(f"Operating point target must be in (0, 1]: {spec!r}")
+        return name, value
+    if name in ('f1', 'youden') and not target:
+        return name, None
+    raise ValueError(f"Unknown operating point {spec!r}")
+
+
+# ============================================
+# CALIBRATORS
+# ============================================
+
+def _logit(score):
+    score = np.clip(np.asarray(score, dtype=np.float64).reshape(-1), _EPS, 1.0 - _EPS)
+    return np.log(score / (1.0 - score))
+
+
+def fit_calibration(score, y, method='platt'):
+    """
+    Fit a calibrator on held-out scores.
+
+    Returns a JSON-serializable dict the server can apply directly:
+        platt:    p = sigmoid(a * logit(score) + b)
+        isotonic: p = linear interpolation over (x, y) breakpoints
+    """
+    y = np.asarray(y).reshape(-1)
+    if method == 'none' or len(np.unique(y)) < 2:
+        return {'method': 'none'}
+
+    if method == 'platt':
+        from sklearn.linear_model import LogisticRegression
+        lr = LogisticRegression(C=1e6)
+        lr.fit(_logit(score).reshape(-1, 1), y)
+        return {'method': 'platt', 'a': float(lr.coef_[0][0]), 'b': float(lr.intercept_[0])}
+
+    if method == 'isotonic':
+        from sklearn.isotonic import IsotonicRegression
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip')
+        iso.fit(np.asarray(score, dtype=np.float64).reshape(-1), y)
+        return {
+            'method': 'isotonic',
+            'x': iso.X_thresholds_.tolist(),
+            'y': iso.y_thresholds_.tolist()
+        }
+
+    raise ValueError(f"Unknown calibration method {method!r}")
+
+
+def apply_calibration(calibration, score):
+    score = np.asarray(score, dtype=np.float64).reshape(-1)
+    method = calibration['method']
+    if method == 'platt':
+        z = calibration['a'] * _logit(score) + calibration['b']
+        return 1.0 / (1.0 + np.exp(-z))
+    if method == 'isotonic':
+        return np.interp(score, calibration['x'], calibration['y'])
+    return score
+
+
+# ============================================
+# THRESHOLD SWEEP
+# ============================================
+
+def threshold_sweep(y, score):
+    """
+    Confusion counts at every distinct score, in one sort + cumsum.
+
+    Entry i predicts "needs water" for score > thresholds[i]; thresholds
+    sit halfway between neighbouring distinct scores, so they match the
+    server's strict comparison and generalize a little better than the
+    raw score itself.
+    """
+    y = np.asarray(y).reshape(-1).astype(np.int64)
+    score = np.asarray(score, dtype=np.float64).reshape(-1)
+
+    order = np.argsort(-score, kind='mergesort')
+    s = score[order]
+    y_sorted = y[order]
+
+    tp_all = np.cumsum(y_sorted)
+    fp_all = np.cumsum(1 - y_sorted)
+    last = np.r_[np.nonzero(np.diff(s))[0], len(s) - 1]
+
+    tp = tp_all[last]
+    fp = fp_all[last]
+    positives = tp_all[-1]
+    negatives = fp_all[-1]
+    fn = positives - tp
+    tn = negatives - fp
+
+    lower = np.r_[s[last[:-1] + 1], np.nextafter(s[-1], -np.inf)]
+    thresholds = np.where(last < len(s) - 1, (s[last] + lower) / 2.0, lower)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = tp / max(positives, 1)
+        fpr = fp / max(negatives, 1)
+        f1 = np.where(tp > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+
+    return {
+        'thresholds': thresholds,
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'precision': precision,
+        'recall': recall,
+        'fpr': fpr,
+        'f1': f1,
+    }
+
+
+def _pick(sweep, spec):
+    """Index into the sweep for an operating point, plus whether its target was met."""
+    name, target = parse_operating_point(spec)
+
+    if name == 'recall':
+        # Sweep runs from high to low threshold: first hit has the best precision
+        ok = np.nonzero(sweep['recall'] >= target)[0]
+        return int(ok[0]), True
+    if name == 'precision':
+        ok = np.nonzero(sweep['precision'] >= target)[0]
+        if len(ok) == 0:
+            return int(np.argmax(sweep['precision'])), False
+        return int(ok[-1]), True
+    if name == 'f1':
+        return int(np.argmax(sweep['f1'])), True
+    return int(np.argmax(sweep['recall'] - sweep['fpr'])), True
+
+
+def binary_metrics(y, score, threshold):
+    y = np.asarray(y).reshape(-1).astype(bool)
+    pred = np.asarray(score).reshape(-1) > threshold
+    tp = int(np.sum(pred & y))
+    fp = int(np.sum(pred & ~y))
+    fn = int(np.sum(~pred & y))
+    tn = int(np.sum(~pred & ~y))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        'accuracy': (tp + tn) / max(len(y), 1),
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+    }
+
+
+def calibrate_thresholds(y_val, score_val, method, specs, default, y_test=None, score_test=None,
+                         min_class_samples=MIN_CLASS_SAMPLES):
+    """
+    Fit calibration and pick one raw-score threshold per operating point.
+
+    Returns a dict ready for model_metadata.json. When the held-out set has
+    fewer than min_class_samples of either class nothing is fitted, the 0.5
+    threshold is kept and 'fallback_reason' says why.
+    """
+    counts = np.bincount(np.asarray(y_val).reshape(-1).astype(np.int64), minlength=2)
+    fallback_reason = None
+    if not specs:
+        fallback_reason = 'no operating points configured'
+    elif counts.min() < min_class_samples:
+        fallback_reason = (f"held-out set has {int(counts[0])} negative / {int(counts[1])} positive "
+                           f"samples (need {min_class_samples} of each)")
+
+    if fallback_reason:
+        return {
+            'calibration': {'method': 'none'},
+            'operating_points': {},
+            'default_operating_point': None,
+            'threshold': 0.5,
+            'held_out_samples': int(len(y_val)),
+            'fallback_reason': fallback_reason,
+        }
+
+    calibration = fit_calibration(score_val, y_val, method)
+
+    sweep = threshold_sweep(y_val, score_val)
+    points = {}
+    for spec in specs:
+        i, met = _pick(sweep, spec)
+        threshold = float(sweep['thresholds'][i])
+        point = {
+            'threshold': threshold,
+            'calibrated_threshold': float(apply_calibration(calibration, [threshold])[0]),
+            'target_met': met,
+            'validation': {
+                'precision': float(sweep['precision'][i]),
+                'recall': float(sweep['recall'][i]),
+                'f1': float(sweep['f1'][i]),
+                'fpr': float(sweep['fpr'][i]),
+            },
+        }
+        if y_test is not None:
+            point['test'] = binary_metrics(y_test, score_test, threshold)
+        points[spec] = point
+
+    return {
+        'calibration': calibration,
+        'operating_points': points,
+        'default_operating_point': default,
+        'threshold': points[default]['threshold'],
+        'held_out_samples': int(len(y_val)),
+        'fallback_reason': None,
+    }
+
+
+def print_operating_points(result):
+    print(f"\n🎚️  Calibration: {result['calibration']['method']} "
+          f"({result['held_out_samples']} held-out samples)")
+    if result['fallback_reason']:
+        print(f"  ⚠️  Keeping threshold 0.5: {result['fallback_reason']}")
+    for spec, point in result['operating_points'].items():
+        marker = '→' if spec == result['default_operating_point'] else ' '
+        val = point['validation']
+        line = (f"  {marker} {spec:<16} threshold={point['threshold']:.4f} "
+                f"P={val['precision']:.3f} R={val['recall']:.3f} F1={val['f1']:.3f}")
+        if 'test' in point:
+            line += f" | test R={point['test']['recall']:.3f}"
+        if not point['target_met']:
+            line += ' (target not reached)'
+        print(line)
+    print(f"  Decision threshold: {result['threshold']:.4f}")
+
+
+def evaluate_operating_points(model_predict, X_train_scaled, y_train, X_test_scaled, y_test,
+                              validation_split):
+    """
+    Calibrate, pick thresholds and report test metrics for a trained model.
+
+    Calibration uses the rows Keras held out for validation (the last
+    `validation_split` of the training set), configured from the environment.
+    The returned result is calibrate_thresholds() plus 'metrics_at_0_5' and
+    'test_metrics' (at the decision threshold).
+
+    Args:
+        model_predict: callable returning model scores for scaled rows
+
+    Returns:
+        (result, test scores, index where the held-out rows start)
+    """
+    split_at = int(len(X_train_scaled) * (1 - validation_split))
+    score_val = model_predict(X_train_scaled[split_at:])
+    score_test = model_predict(X_test_scaled)
+
+    method, specs, default = calibration_config_from_env()
+    result = calibrate_thresholds(
+        y_train[split_at:], score_val, method, specs, default,
+        y_test=y_test, score_test=score_test
+    )
+    print_operating_points(result)
+
+    # Keras metrics are fixed at 0.5; keep those for reference and report
+    # the ones the deployed threshold actually gives
+    result['metrics_at_0_5'] = binary_metrics(y_test, score_test, 0.5)
+    result['test_metrics'] = binary_metrics(y_test, score_test, result['threshold'])
+
+    metrics = result['test_metrics']
+    print(f"\n📊 Test Results (threshold {result['threshold']:.4f}):")
+    print(f"  Accuracy:  {metrics['accuracy']:.4f} ({metrics['accuracy']*100:.2f}%)")
+    print(f"  Precision: {metrics['precision']:.4f}")
+    print(f"  Recall:    {metrics['recall']:.4f}")
+    print(f"  F1-Score:  {metrics['f1']:.4f}")
+
+    return result, score_test, split_at
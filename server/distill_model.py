@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# ============================================
+# DISTILL_MODEL.PY
+# Teacher → Tiny Student Distillation for ESP32
+# ============================================
+#
+# Used by retrain_model.py after the teacher is trained. The student is a
+# 5 → 8 → 1 network on the raw sensor features only (derived features are
+# never used, the firmware cannot compute them cheaply) and is exported as
+# a plain C header the firmware can #include for on-device inference.
+#
+# Retraining writes the header next to the other model artifacts
+# (server/plant_model.h, gitignored). Copying it into the firmware tree is
+# an explicit step:
+#   python distill_model.py export [--source plant_model.h] [--dest ../esp32/smart_plant/plant_model.h]
+
+import argparse
+import os
+import shutil
+
+import numpy as np
+
+from feature_schema import FEATURE_NAMES
+
+STUDENT_HIDDEN_UNITS = 8
+DEFAULT_HEADER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plant_model.h')
+FIRMWARE_HEADER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'esp32', 'smart_plant', 'plant_model.h'
+)
+
+
+def distillation_enabled():
+    """Distillation runs by default; PLANT_DISTILL=0 turns it off."""
+    return os.environ.get('PLANT_DISTILL', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def soften(prob, temperature=2.0):
+    """Soften teacher probabilities by scaling their logits with 1 / temperature."""
+    prob = np.clip(np.asarray(prob, dtype=np.float64).reshape(-1), 1e-7, 1 - 1e-7)
+    logits = np.log(prob / (1.0 - prob))
+    return 1.0 / (1.0 + np.exp(-logits / temperature))
+
+
+def build_student(keras, n_inputs=len(FEATURE_NAMES), hidden_units=STUDENT_HIDDEN_UNITS):
+    student = keras.Sequential([
+        keras.layers.Input(shape=(n_inputs,)),
+        keras.layers.Dense(hidden_units, activation='relu', name='student_hidden'),
+        keras.layers.Dense(1, activation='sigmoid', name='student_output')
+    ])
+    student.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=0.01),
+        loss='binary_crossentropy'
+    )
+    return student
+
+
+def distill_student(keras, X_train, y_train, teacher_prob, alpha=0.3,
+                    temperature=2.0, epochs=200, batch_size=32):
+    """
+    Train the student on a blend of hard labels and softened teacher outputs.
+
+    Binary cross-entropy is linear in its target, so training on
+    alpha * y + (1 - alpha) * soft_teacher is the same as the usual
+    weighted sum of the hard-label and distillation losses.
+
+    Args:
+        X_train: scaled training features; only the raw FEATURE_NAMES
+            columns are used
+        teacher_prob: teacher sigmoid outputs for X_train
+    """
+    X_student = np.asarray(X_train, dtype=np.float32)[:, :len(FEATURE_NAMES)]
+    targets = alpha * np.asarray(y_train, dtype=np.float64) + \
+        (1.0 - alpha) * soften(teacher_prob, temperature)
+
+    student = build_student(keras, n_inputs=X_student.shape[1])
+    early_stop = keras.callbacks.EarlyStopping(
+        monitor='val_loss',
+        patience=20,
+        restore_best_weights=True,
+        verbose=0
+    )
+    student.fit(
+        X_student, targets.astype(np.float32),
+        validation_split=0.2,
+        epochs=epochs,
+        batch_size=batch_size,
+        callbacks=[early_stop],
+        verbose=0
+    )
+    return student
+
+
+def student_forward(weights, X_scaled):
+    """
+    NumPy forward pass that mirrors plant_model_predict() in the C header.
+
+    Args:
+        weights: [W1, b1, W2, b2] as returned by student.get_weights()
+    """
+    w1, b1, w2, b2 = weights
+    X = np.asarray(X_scaled, dtype=np.float32)[:, :w1.shape[0]]
+    hidden = np.maximum(X @ w1 + b1, 0.0)
+    z = hidden @ w2 + b2
+    return (1.0 / (1.0 + np.exp(-z))).reshape(-1)
+
+
+def compare_with_teacher(student_prob, teacher_prob, y_true, teacher_threshold=0.5,
+                         student_threshold=None):
+    """
+    Accuracy of both models on the same rows plus their agreement rate.
+
+    Each model is scored at its own deployed threshold; the student
+    defaults to the teacher's when it has none of its own.
+    """
+    if student_threshold is None:
+        student_threshold = teacher_threshold
+
+    y_true = np.asarray(y_true).reshape(-1)
+    student_pred = np.asarray(student_prob).reshape(-1) > student_threshold
+    teacher_pred = np.asarray(teacher_prob).reshape(-1) > teacher_threshold
+
+    student_acc = float(np.mean(student_pred == y_true))
+    teacher_acc = float(np.mean(teacher_pred == y_true))
+
+    return {
+        'teacher_accuracy': teacher_acc,
+        'student_accuracy': student_acc,
+        'accuracy_loss': teacher_acc - student_acc,
+        'agreement': float(np.mean(student_pred == teacher_pred)),
+        'teacher_threshold': float(teacher_threshold),
+        'student_threshold': float(student_threshold),
+    }
+
+
+def _c_float(value):
+    return f"{float(np.float32(value))!r}f"
+
+
+def _c_array(values):
+    return '{' + ', '.join(_c_float(v) for v in np.asarray(values).reshape(-1)) + '}'
+
+
+def export_c_header(weights, scaler_mean, scaler_scale, path=DEFAULT_HEADER_PATH,
+                    threshold=0.5, metrics=None):
+    """
+    Write the student weights and scaler parameters as a C header.
+
+    Only the raw feature columns of the scaler are exported.
+    """
+    w1, b1, w2, b2 = weights
+    n_inputs, n_hidden = w1.shape
+    mean = np.asarray(scaler_mean)[:n_inputs]
+    scale = np.asarray(scaler_scale)[:n_inputs]
+
+    lines = [
+        '// ============================================',
+        '// PLANT_MODEL.H',
+        '// AUTO-GENERATED by server/distill_model.py - do not edit',
+        '// ============================================',
+        '//',
+        f"// Inputs (in order): {', '.join(FEATURE_NAMES[:n_inputs])}",
+    ]
+    if metrics:
+        lines.append(
+            f"// Student accuracy: {metrics['student_accuracy']:.4f} | "
+            f"teacher: {metrics['teacher_accuracy']:.4f} | "
+            f"agreement: {metrics['agreement']:.4f}"
+        )
+    lines += [
+        '',
+        '#ifndef PLANT_MODEL_H',
+        '#define PLANT_MODEL_H',
+        '',
+        '#include <math.h>',
+        '#include <stdbool.h>',
+        '',
+        f'#define PLANT_MODEL_NUM_INPUTS {n_inputs}',
+        f'#define PLANT_MODEL_HIDDEN_UNITS {n_hidden}',
+        '',
+        f'static const float PLANT_MODEL_THRESHOLD = {_c_float(threshold)};',
+        '',
+        f'static const float plant_model_mean[PLANT_MODEL_NUM_INPUTS] = {_c_array(mean)};',
+        f'static const float plant_model_scale[PLANT_MODEL_NUM_INPUTS] = {_c_array(scale)};',
+        '',
+        'static const float plant_model_w1[PLANT_MODEL_NUM_INPUTS][PLANT_MODEL_HIDDEN_UNITS] = {',
+    ]
+    lines += [f'  {_c_array(row)},' for row in w1]
+    lines += [
+        '};',
+        f'static const float plant_model_b1[PLANT_MODEL_HIDDEN_UNITS] = {_c_array(b1)};',
+        f'static const float plant_model_w2[PLANT_MODEL_HIDDEN_UNITS] = {_c_array(w2)};',
+        f'static const float plant_model_b2 = {_c_float(np.asarray(b2).reshape(-1)[0])};',
+        '',
+        '// Returns the probability that the plant needs water (raw, unscaled inputs)',
+        'static inline float plant_model_predict(const float input[PLANT_MODEL_NUM_INPUTS]) {',
+        '  float x[PLANT_MODEL_NUM_INPUTS];',
+        '  for (int i = 0; i < PLANT_MODEL_NUM_INPUTS; i++) {',
+        '    x[i] = (input[i] - plant_model_mean[i]) / plant_model_scale[i];',
+        '  }',
+        '',
+        '  float z = plant_model_b2;',
+        '  for (int j = 0; j < PLANT_MODEL_HIDDEN_UNITS; j++) {',
+        '    float h = plant_model_b1[j];',
+        '    for (int i = 0; i < PLANT_MODEL_NUM_INPUTS; i++) {',
+        '      h += x[i] * plant_model_w1[i][j];',
+        '    }',
+        '    if (h > 0.0f) z += h * plant_model_w2[j];',
+        '  }',
+        '',
+        '  return 1.0f / (1.0f + expf(-z));',
+        '}',
+        '',
+        'static inline bool plant_model_needs_water(const float input[PLANT_MODEL_NUM_INPUTS]) {',
+        '  return plant_model_predict(input) > PLANT_MODEL_THRESHOLD;',
+        '}',
+        '',
+        '#endif // PLANT_MODEL_H',
+        '',
+    ]
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines))
+
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy the distilled student header into the firmware tree')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='Copy the last generated header to the firmware sketch')
+    export_parser.add_argument('--source', default=DEFAULT_HEADER_PATH)
+    export_parser.add_argument('--dest', default=FIRMWARE_HEADER_PATH)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} not found; run retrain_model.py (distillation enabled) first")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.dest)), exist_ok=True)
+    shutil.copyfile(args.source, args.dest)
+    print(f"✅ Exported {args.source} -> {os.path.abspath(args.dest)}")
+
+
+if __name__ == '__main__':
+    main()
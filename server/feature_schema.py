@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# ============================================
+# FEATURE_SCHEMA.PY
+# Shared Feature Schema, Validation & Engineering
+# ============================================
+#
+# Single source of truth for the model inputs used by retrain_model.py,
+# smart-plant-ml/train_model.py, scaler_params.json and model_metadata.json.
+# The column order here MUST match the order the Node.js server feeds the
+# model in mlService.predict(); derived features are recomputed there from
+# scaler_params.json 'feature_names' (FEATURE_BUILDERS), so a new derived
+# feature has to be added on both sides.
+
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# name, dtype, valid min, valid max, value the ESP32 clamps to when saturated
+Feature = namedtuple('Feature', ['name', 'dtype', 'min', 'max', 'saturates_at'])
+
+FEATURE_SCHEMA = [
+    Feature('moisture', 'float32', 0.0, 100.0, 100.0),   # constrain(…, 0, 100) on ESP32
+    Feature('hour', 'int32', 0, 23, None),
+    Feature('days_since_water', 'float32', 0.0, 30.0, None),
+    Feature('temperature', 'float32', -10.0, 60.0, None),
+    Feature('air_humidity', 'float32', 0.0, 100.0, None),
+]
+
+FEATURE_NAMES = [f.name for f in FEATURE_SCHEMA]
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+DERIVED_FEATURE_NAMES = ['hour_sin', 'hour_cos', 'vpd_kpa']
+LABEL_NAME = 'needs_water'
+
+# ESP32 sends -999 when the DHT sensor fails to read
+SENSOR_ERROR_VALUE = -999
+
+_MIN = np.array([f.min for f in FEATURE_SCHEMA], dtype=np.float64)
+_MAX = np.array([f.max for f in FEATURE_SCHEMA], dtype=np.float64)
+_SATURATION = np.array(
+    [np.nan if f.saturates_at is None else f.saturates_at for f in FEATURE_SCHEMA],
+    dtype=np.float64
+)
+_INTEGER = np.array([np.issubdtype(np.dtype(f.dtype), np.integer) for f in FEATURE_SCHEMA])
+
+
+def derived_features_enabled():
+    """Derived features are opt-in via PLANT_DERIVED_FEATURES=1."""
+    return os.environ.get('PLANT_DERIVED_FEATURES', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def feature_names(derived=False):
+    return FEATURE_NAMES + DERIVED_FEATURE_NAMES if derived else list(FEATURE_NAMES)
+
+
+def validate_features(X, mode='drop', drop_saturated=True):
+    """
+    Validate raw feature rows against the schema.
+
+    Args:
+        X: (n, 5) array in FEATURE_NAMES order
+        mode: 'drop' removes out-of-range rows and non-integer values in
+            integer columns; 'clip' clamps into range and rounds them
+        drop_saturated: drop rows where a sensor sits on its clamp value
+
+    Non-finite values and sensor error sentinels are always dropped.
+
+    Returns:
+        (X_valid, keep_mask, report)
+    """
+    if mode not in ('drop', 'clip'):
+        raise ValueError(f"mode must be 'drop' or 'clip', got {mode!r}")
+
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim != 2 or X.shape[1] != len(FEATURE_SCHEMA):
+        raise ValueError(f"Expected shape (n, {len(FEATURE_SCHEMA)}), got {X.shape}")
+
+    invalid = ~np.isfinite(X) | (X == SENSOR_ERROR_VALUE)
+    out_of_range = ~invalid & ((X < _MIN) | (X > _MAX))
+    non_integer = ~invalid & _INTEGER & (X != np.round(X))
+    saturated = X == _SATURATION  # NaN never compares equal
+
+    keep = ~invalid.any(axis=1)
+    if mode == 'drop':
+        keep &= ~out_of_range.any(axis=1) & ~non_integer.any(axis=1)
+    if drop_saturated:
+        keep &= ~saturated.any(axis=1)
+
+    X_valid = X[keep]
+    if mode == 'clip':
+        X_valid = np.clip(X_valid, _MIN, _MAX)
+        X_valid[:, _INTEGER] = np.round(X_valid[:, _INTEGER])
+
+    report = {
+        'total_rows': int(len(X)),
+        'kept_rows': int(keep.sum()),
+        'invalid_rows': int(invalid.any(axis=1).sum()),
+        'out_of_range_rows': int(out_of_range.any(axis=1).sum()),
+        'non_integer_rows': int(non_integer.any(axis=1).sum()),
+        'saturated_rows': int(saturated.any(axis=1).sum()),
+        'mode': mode,
+        'drop_saturated': drop_saturated,
+    }
+
+    return X_valid, keep, report
+
+
+def add_derived_features(X):
+    """
+    Append cyclical hour encoding and vapour pressure deficit (kPa).
+
+    VPD uses the Tetens equation: es = 0.6108 * exp(17.27 T / (T + 237.3)),
+    VPD = es * (1 - RH / 100).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    hour = X[:, FEATURE_INDEX['hour']]
+    temperature = X[:, FEATURE_INDEX['temperature']]
+    air_humidity = X[:, FEATURE_INDEX['air_humidity']]
+
+    angle = 2.0 * np.pi * hour / 24.0
+    saturation_vp = 0.6108 * np.exp(17.27 * temperature / (temperature + 237.3))
+    vpd = saturation_vp * (1.0 - air_humidity / 100.0)
+
+    return np.column_stack([X, np.sin(angle), np.cos(angle), vpd])
+
+
+def clean_dataframe(df, mode='drop', drop_saturated=True, require_label=True):
+    """
+    Drop (or clip) invalid sensor rows from a training DataFrame.
+
+    Run this right after loading so every later stage works on clean rows.
+    With require_label, LABEL_NAME must exist and rows whose label is not
+    0 or 1 (including NaN) are dropped. Columns are cast to the schema dtypes.
+
+    Returns:
+        (df_clean, report)
+    """
+    required = FEATURE_NAMES + ([LABEL_NAME] if require_label else [])
+    missing = [name for name in required if name not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+
+    X_valid, keep, report = validate_features(
+        df[FEATURE_NAMES].to_numpy(dtype=np.float64),
+        mode=mode,
+        drop_saturated=drop_saturated
+    )
+
+    if require_label:
+        labels = pd.to_numeric(df[LABEL_NAME], errors='coerce').to_numpy(dtype=np.float64)
+        bad_label = ~np.isin(labels, (0.0, 1.0))
+        report['invalid_label_rows'] = int(bad_label.sum())
+        X_valid = X_valid[~bad_label[keep]]
+        keep = keep & ~bad_label
+        report['kept_rows'] = int(keep.sum())
+
+    df_clean = df.loc[keep].copy()
+    for i, feature in enumerate(FEATURE_SCHEMA):
+        df_clean[feature.name] = X_valid[:, i].astype(feature.dtype)
+    if require_label:
+        df_clean[LABEL_NAME] = labels[keep].astype(np.int32)
+
+    return df_clean, report
+
+
+def build_feature_matrix(df, derived=False):
+    """
+    Build the model input matrix in schema order.
+
+    Returns:
+        (X, names)
+    """
+    X = df[FEATURE_NAMES].to_numpy(dtype=np.float64)
+    if derived:
+        X = add_derived_features(X)
+    return X, feature_names(derived)
+
+
+def print_validation_report(report):
+    print("🧹 Feature validation:")
+    print(f"  Rows:         {report['total_rows']}")
+    print(f"  Invalid:      {report['invalid_rows']} (NaN / sensor error)")
+    print(f"  Out of range: {report['out_of_range_rows']} ({report['mode']})")
+    print(f"  Non-integer:  {report['non_integer_rows']} ({report['mode']})")
+    print(f"  Saturated:    {report['saturated_rows']}"
+          f"{' (dropped)' if report['drop_saturated'] else ''}")
+    if 'invalid_label_rows' in report:
+        print(f"  Bad label:    {report['invalid_label_rows']}")
+    print(f"  Kept:         {report['kept_rows']}")
@@ -17,11 +17,27 @@ from datetime import datetime
 import os
 import sys
 
+from run_config import load_run_config, apply_run_config, print_run_config
+from calibration import calibrate_thresholds, evaluate_operating_points
+from feature_schema import (
+    FEATURE_NAMES, LABEL_NAME, derived_features_enabled,
+    clean_dataframe, build_feature_matrix, print_validation_report
+)
+from distill_model import (
+    DEFAULT_HEADER_PATH, distillation_enabled, distill_student,
+    student_forward, compare_with_teacher, export_c_header
+)
+
+# Seed + thread pools must be set before TensorFlow runs any op
+run_config = apply_run_config(load_run_config(), tf)
+
 print("=" * 70)
 print("🔄 AI-Enhanced ML Model Retraining")
 print("=" * 70)
 print(f"TensorFlow Version: {tf.__version__}")
 print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+print_run_config(run_config)
+print()
 
 # ============================================
 # 1. LOAD EXISTING TRAINING DATA
@@ -56,9 +72,7 @@ if original_data is not None and ai_data is not None:
     combined_data = pd.concat([original_data, ai_data], ignore_index=True)
     
     # Remove duplicates
-    combined_data = combined_data.drop_duplicates(
-        subset=['moisture', 'hour', 'days_since_water', 'temperature', 'air_humidity']
-    )
+    combined_data = combined_data.drop_duplicates(subset=FEATURE_NAMES)
     
     print(f"📊 Combined dataset: {len(combined_data)} samples")
     print(f"   - Original: {len(original_data)}")
@@ -80,6 +94,15 @@ else:
     print("Please run the server and generate AI analyses first.")
     sys.exit(1)
 
+# Drop invalid / saturated sensor rows before anything else touches them
+print()
+df, validation_report = clean_dataframe(df)
+print_validation_report(validation_report)
+
+if len(df) == 0:
+    print("\n❌ No valid training rows left after validation!")
+    sys.exit(1)
+
 # ============================================
 # 3. DATA ANALYSIS
 # ============================================
@@ -90,9 +113,9 @@ print("=" * 70)
 
 print(f"\nDataset shape: {df.shape}")
 print(f"\nClass distribution:")
-print(df['needs_water'].value_counts())
+print(df[LABEL_NAME].value_counts())
 print(f"\nClass percentage:")
-print(df['needs_water'].value_counts(normalize=True) * 100)
+print(df[LABEL_NAME].value_counts(normalize=True) * 100)
 
 # ============================================
 # 4. PREPARE DATA
@@ -103,12 +126,13 @@ print("🔧 Preparing data for training...")
 print("=" * 70)
 
 # Features and labels
-X = df[['moisture', 'hour', 'days_since_water', 'temperature', 'air_humidity']].values
-y = df['needs_water'].values
+use_derived_features = derived_features_enabled()
+X, feature_names = build_feature_matrix(df, derived=use_derived_features)
+y = df[LABEL_NAME].values
 
 # Split train/test
 X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
+    X, y, test_size=0.2, random_state=run_config['seed'], stratify=y
 )
 
 # Normalize features
@@ -132,7 +156,7 @@ print(f"\nClass weights: {class_weight_dict}")
 scaler_params = {
     'mean': scaler.mean_.tolist(),
     'scale': scaler.scale_.tolist(),
-    'feature_names': ['moisture', 'hour', 'days_since_water', 'temperature', 'air_humidity']
+    'feature_names': feature_names
 }
 
 with open('scaler_params.json', 'w') as f:
@@ -149,7 +173,7 @@ print("🏗️  Building neural network...")
 print("=" * 70)
 
 model = keras.Sequential([
-    keras.layers.Input(shape=(5,)),
+    keras.layers.Input(shape=(len(feature_names),)),
     keras.layers.Dense(64, activation='relu', name='layer_1'),
     keras.layers.BatchNormalization(),
     keras.layers.Dropout(0.3),
@@ -182,6 +206,9 @@ print("\n" + "=" * 70)
 print("🎓 Training model with AI-enhanced data...")
 print("=" * 70)
 
+# Fraction of training rows Keras holds out (also used for calibration)
+VALIDATION_SPLIT = 0.2
+
 early_stop = keras.callbacks.EarlyStopping(
     monitor='val_loss',
     patience=20,
@@ -206,7 +233,7 @@ checkpoint = keras.callbacks.ModelCheckpoint(
 
 history = model.fit(
     X_train_scaled, y_train,
-    validation_split=0.2,
+    validation_split=VALIDATION_SPLIT,
     epochs=150,
     batch_size=32,
     class_weight=class_weight_dict,
@@ -233,16 +260,25 @@ test_auc = test_results[4]
 
 f1_score = 2 * (test_precision * test_recall) / (test_precision + test_recall)
 
-print(f"\n📊 Test Results:")
-print(f"  Accuracy:  {test_acc:.4f} ({test_acc*100:.2f}%)")
-print(f"  Precision: {test_precision:.4f}")
-print(f"  Recall:    {test_recall:.4f}")
-print(f"  F1-Score:  {f1_score:.4f}")
+print(f"\n📊 Test Results (Keras, threshold 0.5):")
+print(f"  Accuracy@0.5:  {test_acc:.4f} ({test_acc*100:.2f}%)")
+print(f"  Precision@0.5: {test_precision:.4f}")
+print(f"  Recall@0.5:    {test_recall:.4f}")
+print(f"  F1-Score@0.5:  {f1_score:.4f}")
 print(f"  AUC:       {test_auc:.4f}")
 print(f"  Loss:      {test_loss:.4f}")
 
-y_pred_prob = model.predict(X_test_scaled, verbose=0)
-y_pred = (y_pred_prob > 0.5).astype(int)
+threshold_result, y_pred_prob, split_at = evaluate_operating_points(
+    lambda X: model.predict(X, verbose=0),
+    X_train_scaled, y_train, X_test_scaled, y_test, VALIDATION_SPLIT
+)
+decision_threshold = threshold_result['threshold']
+test_acc = threshold_result['test_metrics']['accuracy']
+test_precision = threshold_result['test_metrics']['precision']
+test_recall = threshold_result['test_metrics']['recall']
+f1_score = threshold_result['test_metrics']['f1']
+
+y_pred = (y_pred_prob > decision_threshold).astype(int)
 
 from sklearn.metrics import confusion_matrix, classification_report
 
@@ -255,7 +291,59 @@ print(classification_report(y_test, y_pred,
                           target_names=['No Water', 'Water Needed']))
 
 # ============================================
-# 8. SAVE MODEL
+# 8. DISTILL FIRMWARE MODEL (ESP32)
+# ============================================
+
+student_metrics = None
+
+if distillation_enabled():
+    print("\n" + "=" * 70)
+    print("🧪 Distilling tiny student model for ESP32...")
+    print("=" * 70)
+
+    try:
+        # Distill on the teacher's training rows; the held-out rows pick the
+        # student's own threshold for the same operating point
+        teacher_train_prob = model.predict(X_train_scaled[:split_at], verbose=0)
+        student = distill_student(keras, X_train_scaled[:split_at], y_train[:split_at], teacher_train_prob)
+        student_weights = student.get_weights()
+
+        # Same math as the generated C code, so this is what the firmware will see
+        student_val_prob = student_forward(student_weights, X_train_scaled[split_at:])
+        student_point = threshold_result['default_operating_point']
+        student_threshold = calibrate_thresholds(
+            y_train[split_at:], student_val_prob, 'none',
+            [student_point] if student_point else [], student_point
+        )['threshold']
+
+        student_test_prob = student_forward(student_weights, X_test_scaled)
+        student_metrics = compare_with_teacher(
+            student_test_prob, y_pred_prob, y_test,
+            teacher_threshold=decision_threshold,
+            student_threshold=student_threshold
+        )
+
+        header_path = os.environ.get('PLANT_STUDENT_HEADER', DEFAULT_HEADER_PATH)
+        export_c_header(
+            student_weights, scaler.mean_, scaler.scale_,
+            path=header_path, threshold=student_threshold, metrics=student_metrics
+        )
+        student_metrics['architecture'] = f"{student_weights[0].shape[0]}-{student_weights[0].shape[1]}-1"
+        student_metrics['header'] = os.path.abspath(header_path)
+
+        print(f"  Teacher accuracy: {student_metrics['teacher_accuracy']:.4f}")
+        print(f"  Student accuracy: {student_metrics['student_accuracy']:.4f}")
+        print(f"  Accuracy loss:    {student_metrics['accuracy_loss']:+.4f}")
+        print(f"  Agreement:        {student_metrics['agreement']:.2%}")
+        print(f"  Thresholds:       teacher {decision_threshold:.4f} | student {student_threshold:.4f}")
+        print(f"✅ Student header saved: {header_path}")
+        print("   Copy it into the firmware with: python distill_model.py export")
+    except Exception as e:
+        student_metrics = None
+        print(f"⚠️  Distillation skipped: {e}")
+
+# ============================================
+# 9. SAVE MODEL
 # ============================================
 
 print("\n" + "=" * 70)
@@ -289,10 +377,20 @@ metadata = {
     'f1_score': float(f1_score),
     'auc': float(test_auc),
     'loss': float(test_loss),
-    'features': ['moisture', 'hour', 'days_since_water', 'temperature', 'air_humidity'],
-    'threshold': 0.5,
+    'features': feature_names,
+    'derived_features': use_derived_features,
+    'validation': validation_report,
+    'threshold': decision_threshold,
+    'metrics_at_0_5': threshold_result['metrics_at_0_5'],
+    'default_operating_point': threshold_result['default_operating_point'],
+    'operating_points': threshold_result['operating_points'],
+    'calibration': threshold_result['calibration'],
+    'calibration_samples': threshold_result['held_out_samples'],
+    'calibration_fallback': threshold_result['fallback_reason'],
     'model_type': 'binary_classification',
-    'training_method': 'ai_enhanced_retraining'
+    'training_method': 'ai_enhanced_retraining',
+    'run_config': run_config,
+    'student_model': student_metrics
 }
 
 with open('model_metadata.json', 'w') as f:
@@ -306,7 +404,7 @@ df.to_csv(combined_dataset_file, index=False)
 print(f"✅ Combined dataset saved: {combined_dataset_file}")
 
 # ============================================
-# 9. VISUALIZATION (Optional)
+# 10. VISUALIZATION (Optional)
 # ============================================
 
 try:
@@ -342,7 +440,7 @@ try:
     plt.grid(True, alpha=0.3)
     
     plt.subplot(2, 2, 4)
-    df['needs_water'].value_counts().plot(kind='bar', color=['skyblue', 'salmon'])
+    df[LABEL_NAME].value_counts().plot(kind='bar', color=['skyblue', 'salmon'])
     plt.title('Class Distribution', fontsize=12, fontweight='bold')
     plt.xlabel('Needs Water')
     plt.ylabel('Count')
@@ -356,7 +454,7 @@ except Exception as e:
     print(f"⚠️  Visualization skipped: {e}")
 
 # ============================================
-# 10. TEST PREDICTIONS
+# 11. TEST PREDICTIONS
 # ============================================
 
 print("\n" + "=" * 70)
@@ -370,18 +468,12 @@ scenarios = [
 ]
 
 for scenario in scenarios:
-    input_data = np.array([[
-        scenario['moisture'],
-        scenario['hour'],
-        scenario['days_since_water'],
-        scenario['temperature'],
-        scenario['air_humidity']
-    ]])
+    input_data, _ = build_feature_matrix(pd.DataFrame([scenario]), derived=use_derived_features)
     
     input_scaled = scaler.transform(input_data)
     prediction = model.predict(input_scaled, verbose=0)[0][0]
     
-    needs_water = "YES" if prediction > 0.5 else "NO"
+    needs_water = "YES" if prediction > decision_threshold else "NO"
     
     print(f"\n{scenario['name']}:")
     print(f"  Moisture: {scenario['moisture']}% | Hour: {scenario['hour']}:00")
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+# ============================================
+# RETRAIN_RUNNER.PY
+# Resource-Limited, Coalescing Retrain Job Runner
+# ============================================
+#
+# Wraps retrain_model.py so training can share a host with the API server:
+#   - CPU budget: TF/OpenMP thread counts, CPU affinity and lower priority
+#   - Memory budget: child RSS is watched and the job killed when exceeded
+#   - Coalescing: a request arriving while a job is queued or running is
+#     attached to that job instead of starting a second one
+#   - Cancellation and progress via retrain_status.json
+#
+# Usage:
+#   python retrain_runner.py submit [--trigger manual|auto] [--threads N] [--memory-mb MB]
+#   python retrain_runner.py cancel
+#   python retrain_runner.py status
+#
+# All state files live in the working directory, next to the model artifacts.
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from run_config import DEFAULT_SEED
+
+STATUS_FILE = 'retrain_status.json'
+RUNNER_LOCK = 'retrain.lock'
+STATUS_LOCK = 'retrain_status.lock'
+CANCEL_FILE = 'retrain.cancel'
+
+# Machine-readable line telling the caller which job served its request:
+#   RETRAIN_JOB job_id=<id> role=owner|attached
+JOB_MARKER = 'RETRAIN_JOB'
+
+ACTIVE_STATES = ('queued', 'running', 'cancelling')
+
+EXIT_CANCELLED = 130
+EXIT_MEMORY_LIMIT = 137
+
+POLL_SECONDS = 0.5
+TERMINATE_GRACE_SECONDS = 10
+
+# A running job rewrites the status file at least this often...
+HEARTBEAT_SECONDS = 30
+# ...so an active status older than this means the runner died
+STALE_STATUS_SECONDS = 300
+
+# Lines printed by retrain_model.py that mark the start of a stage
+STAGE_MARKERS = [
+    ('Loading training data', 'loading'),
+    ('Preparing data', 'preparing'),
+    ('Building neural network', 'building'),
+    ('Training model', 'training'),
+    ('Evaluating model', 'evaluating'),
+    ('Calibration:', 'calibrating'),
+    ('Distilling', 'distilling'),
+    ('Saving retrained model', 'saving'),
+    ('Testing predictions', 'testing'),
+]
+EPOCH_PATTERN = re.compile(r'Epoch (\d+)/(\d+)')
+
+
+# ============================================
+# STATE FILES
+# ============================================
+
+@contextlib.contextmanager
+def file_mutex(path, timeout=30, stale_after=60):
+    """Cross-process mutex based on exclusive file creation."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale_after:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Could not acquire {path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+
+def read_status():
+    try:
+        with open(STATUS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'state': 'idle'}
+
+
+def write_status(status):
+    status['updated_at'] = datetime.now().isoformat()
+    tmp_path = f"{STATUS_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp_path, STATUS_FILE)
+
+
+def update_status(**changes):
+    with file_mutex(STATUS_LOCK):
+        status = read_status()
+        status.update(changes)
+        write_status(status)
+        return status
+
+
+def _windows_pid_alive(pid):
+    import ctypes
+    from ctypes import wintypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return False
+    try:
+        exit_code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return False
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def pid_alive(pid):
+    if not pid:
+        return False
+    if os.name == 'nt':
+        return _windows_pid_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def status_is_stale(status):
+    """True when an active status has not been refreshed for STALE_STATUS_SECONDS."""
+    if status.get('state') not in ACTIVE_STATES:
+        return False
+    try:
+        updated = datetime.fromisoformat(status['updated_at'])
+    except (KeyError, TypeError, ValueError):
+        return True
+    return (datetime.now() - updated).total_seconds() > STALE_STATUS_SECONDS
+
+
+def runner_alive(status):
+    return pid_alive(status.get('runner_pid', 0)) and not status_is_stale(status)
+
+
+def try_acquire_runner_lock():
+    """Take the runner lock, clearing it first if its owner has died."""
+    for _ in range(2):
+        try:
+            fd = os.open(RUNNER_LOCK, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return True
+        except FileExistsError:
+            try:
+                with open(RUNNER_LOCK) as f:
+                    owner = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                owner = 0
+            if owner and pid_alive(owner) and not status_is_stale(read_status()):
+                return False
+            with contextlib.suppress(OSError):
+                os.remove(RUNNER_LOCK)
+    return False
+
+
+def release_runner_lock():
+    with contextlib.suppress(OSError):
+        os.remove(RUNNER_LOCK)
+
+
+# ============================================
+# RESOURCE LIMITS
+# ============================================
+
+def default_threads():
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def limited_env(threads):
+    """
+    Environment for the training process with every thread pool capped.
+
+    PYTHONHASHSEED only takes effect at interpreter startup, so the runner
+    sets it here from PLANT_SEED (see run_config.py) unless already given.
+    PLANT_*_OP_THREADS set by the operator are kept; `threads` is only their
+    fallback and the cap for the native (OpenMP / BLAS) pools and affinity.
+    """
+    env = dict(os.environ)
+    env.setdefault('PYTHONHASHSEED', env.get('PLANT_SEED', '').strip() or str(DEFAULT_SEED))
+    env.setdefault('PLANT_INTRA_OP_THREADS', str(threads))
+    env.setdefault('PLANT_INTER_OP_THREADS', str(min(2, threads)))
+    env.update({
+        'PYTHONUNBUFFERED': '1',
+        'TF_NUM_INTRAOP_THREADS': str(threads),
+        'TF_NUM_INTEROP_THREADS': str(min(2, threads)),
+        'OMP_NUM_THREADS': str(threads),
+        'OPENBLAS_NUM_THREADS': str(threads),
+        'MKL_NUM_THREADS': str(threads),
+    })
+    return env
+
+
+def make_preexec(threads, niceness):
+    """Pin the child to the last `threads` CPUs and lower its priority (POSIX only)."""
+    if os.name == 'nt':
+        return None
+
+    def preexec():
+        if niceness:
+            os.nice(niceness)
+        if hasattr(os, 'sched_setaffinity'):
+            cpus = sorted(os.sched_getaffinity(0))
+            os.sched_setaffinity(0, cpus[-threads:])
+
+    return preexec
+
+
+def rss_mb(pid):
+    """Resident memory of a process in MB, or None when it cannot be read."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def terminate(process):
+    process.terminate()
+    try:
+        process.wait(timeout=TERMINATE_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# ============================================
+# JOB EXECUTION
+# ============================================
+
+def stream_output(process, progress):
+    """Echo child output (autoRetrain.js parses it) and track progress."""
+    for line in iter(process.stdout.readline, ''):
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+        for marker, stage in STAGE_MARKERS:
+            if marker in line:
+                progress['stage'] = stage
+                break
+
+        epochs = EPOCH_PATTERN.findall(line)
+        if epochs:
+            epoch, total = epochs[-1]
+            progress['epoch'] = int(epoch)
+            progress['epochs'] = int(total)
+
+
+def run_job(args):
+    """
+    Run the training script under the configured limits.
+
+    stderr is inherited so errors still reach autoRetrain.js unchanged.
+
+    Returns:
+        (state, exit_code, reason, progress)
+    """
+    command = [args.python, args.script]
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        env=limited_env(args.threads),
+        preexec_fn=make_preexec(args.threads, args.nice)
+    )
+
+    progress = {'stage': 'starting'}
+    reader = threading.Thread(target=stream_output, args=(process, progress), daemon=True)
+    reader.start()
+
+    update_status(state='running', pid=process.pid, started_at=datetime.now().isoformat())
+
+    outcome = None
+    peak_mb = 0.0
+    memory_watch = args.memory_mb > 0 and rss_mb(process.pid) is not None
+    if args.memory_mb > 0 and not memory_watch:
+        print("⚠️  Memory usage cannot be read on this platform; memory budget not enforced")
+
+    last_progress = None
+    last_write = time.time()
+    while process.poll() is None:
+        time.sleep(POLL_SECONDS)
+
+        if os.path.exists(CANCEL_FILE):
+            print("\n🛑 Cancellation requested, stopping training...")
+            terminate(process)
+            outcome = ('cancelled', EXIT_CANCELLED)
+            break
+
+        if memory_watch:
+            current = rss_mb(process.pid) or 0.0
+            peak_mb = max(peak_mb, current)
+            if current > args.memory_mb:
+                print(f"\n❌ Memory budget exceeded ({current:.0f} MB > {args.memory_mb} MB), stopping training...")
+                terminate(process)
+                outcome = ('failed', EXIT_MEMORY_LIMIT)
+                break
+
+        snapshot = dict(progress, peak_rss_mb=round(peak_mb, 1))
+        if snapshot != last_progress or time.time() - last_write > HEARTBEAT_SECONDS:
+            update_status(progress=snapshot)
+            last_progress = snapshot
+            last_write = time.time()
+
+    reader.join(timeout=TERMINATE_GRACE_SECONDS)
+
+    if outcome is None:
+        code = process.returncode
+        outcome = ('succeeded' if code == 0 else 'failed', code)
+
+    state, code = outcome
+    reason = 'memory_limit_exceeded' if code == EXIT_MEMORY_LIMIT else None
+    return state, code, reason, dict(progress, peak_rss_mb=round(peak_mb, 1))
+
+
+def wait_for_job(job_id):
+    """Block until the given job finishes and return its exit code."""
+    while True:
+        status = read_status()
+        if status.get('job_id') != job_id or status.get('state') not in ACTIVE_STATES:
+            break
+        if not runner_alive(status):
+            print(f"❌ Runner of job {job_id} is gone; giving up")
+            return 1
+        time.sleep(1)
+
+    print(f"📋 Job {job_id} finished: {status.get('state')}")
+    return status.get('exit_code', 1) if status.get('job_id') == job_id else 1
+
+
+# ============================================
+# COMMANDS
+# ============================================
+
+def submit(args):
+    request = {'trigger': args.trigger, 'requested_at': datetime.now().isoformat(), 'pid': os.getpid()}
+
+    attached_job = None
+    while attached_job is None:
+        with file_mutex(STATUS_LOCK):
+            if try_acquire_runner_lock():
+                job_id = uuid.uuid4().hex[:12]
+                with contextlib.suppress(OSError):
+                    os.remove(CANCEL_FILE)
+                write_status({
+                    'state': 'queued',
+                    'job_id': job_id,
+                    'runner_pid': os.getpid(),
+                    'requests': [request],
+                    'limits': {
+                        'threads': args.threads,
+                        'memory_mb': args.memory_mb,
+                        'nice': args.nice,
+                    },
+                    'queued_at': datetime.now().isoformat(),
+                    'progress': None,
+                })
+                break
+
+            status = read_status()
+            if status.get('state') in ACTIVE_STATES and runner_alive(status):
+                status['requests'].append(request)
+                write_status(status)
+                attached_job = status['job_id']
+                print(f"{JOB_MARKER} job_id={attached_job} role=attached", flush=True)
+                print(f"🔗 Retrain already {status['state']}; request attached to job {attached_job}")
+                continue
+
+        # Lock holder just finished; try again
+        time.sleep(POLL_SECONDS)
+
+    if attached_job is not None:
+        return wait_for_job(attached_job)
+
+    print(f"{JOB_MARKER} job_id={job_id} role=owner", flush=True)
+    state, code, reason, progress = 'failed', 1, 'runner_error', None
+    try:
+        print(f"⏳ Job {job_id} queued; coalescing requests for {args.coalesce_seconds}s...")
+        time.sleep(args.coalesce_seconds)
+
+        if os.path.exists(CANCEL_FILE):
+            state, code, reason = 'cancelled', EXIT_CANCELLED, None
+        else:
+            print(f"🚀 Starting job {job_id} (threads={args.threads}, memory={args.memory_mb or 'unlimited'} MB)")
+            state, code, reason, progress = run_job(args)
+    finally:
+        # Final state and lock release happen together so a new job can't be overwritten
+        with file_mutex(STATUS_LOCK):
+            status = read_status()
+            status.update(
+                state=state,
+                exit_code=code,
+                reason=reason,
+                progress=progress,
+                pid=None,
+                finished_at=datetime.now().isoformat()
+            )
+            write_status(status)
+            with contextlib.suppress(OSError):
+                os.remove(CANCEL_FILE)
+            release_runner_lock()
+
+    print(f"📋 Job {job_id} {state} (exit code {code}, {len(status['requests'])} request(s) coalesced)")
+    return code
+
+
+def handle_sigterm(*_):
+    """
+    SIGTERM handler: the runner cancels its job and exits once the child
+    is stopped; a process merely attached to another job just exits.
+    """
+    if read_status().get('runner_pid') == os.getpid():
+        open(CANCEL_FILE, 'w').close()
+    else:
+        sys.exit(EXIT_CANCELLED)
+
+
+def cancel(args):
+    with file_mutex(STATUS_LOCK):
+        status = read_status()
+        if status.get('state') not in ACTIVE_STATES:
+            print("⚠️  No retrain job is running")
+            return 1
+        open(CANCEL_FILE, 'w').close()
+        status['state'] = 'cancelling'
+        write_status(status)
+
+    print(f"🛑 Cancellation requested for job {status['job_id']}")
+    return 0
+
+
+def show_status(args):
+    print(json.dumps(read_status(), indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resource-limited retrain job runner')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit_parser = commands.add_parser('submit', help='Request a retrain (coalesced with any active job)')
+    submit_parser.add_argument('--trigger', default='manual')
+    submit_parser.add_argument('--script', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'retrain_model.py'))
+    submit_parser.add_argument('--python', default=sys.executable)
+    submit_parser.add_argument('--threads', type=int,
+                               default=int(os.environ.get('PLANT_RETRAIN_THREADS', default_threads())))
+    submit_parser.add_argument('--memory-mb', type=int,
+                               default=int(os.environ.get('PLANT_RETRAIN_MEMORY_MB', 2048)),
+                               help='0 disables the memory budget')
+    submit_parser.add_argument('--nice', type=int, default=10)
+    submit_parser.add_argument('--coalesce-seconds', type=float, default=5.0)
+    submit_parser.set_defaults(handler=submit)
+
+    commands.add_parser('cancel', help='Cancel the active job').set_defaults(handler=cancel)
+    commands.add_parser('status', help='Print the status file').set_defaults(handler=show_status)
+
+    args = parser.parse_args()
+    if getattr(args, 'threads', 1) < 1:
+        parser.error('--threads must be >= 1')
+
+    # Let `kill <runner>` cancel the job cleanly
+    if args.command == 'submit' and hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, handle_sigterm)
+
+    sys.exit(args.handler(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# ============================================
+# RUN_CONFIG.PY
+# Reproducible / Multi-threaded Training Configuration
+# ============================================
+#
+# Shared by retrain_model.py and smart-plant-ml/train_model.py.
+# Must be applied before TensorFlow executes its first op, otherwise
+# the thread pool sizes can no longer be changed.
+#
+# Environment variables:
+#   PLANT_SEED            - seed for Python, NumPy and TensorFlow (default 42)
+#   PLANT_INTRA_OP_THREADS - threads used inside a single op (0 = TF default)
+#   PLANT_INTER_OP_THREADS - threads used to run independent ops (0 = TF default)
+#   PLANT_DETERMINISTIC   - '1' / 'true' enables TF op determinism
+#
+# Python's hash seed is fixed at interpreter startup and cannot be set from
+# here; retrain_runner.py exports PYTHONHASHSEED=PLANT_SEED to the training
+# process. The value actually in effect is recorded as 'python_hash_seed'.
+
+import os
+import random
+
+import numpy as np
+
+DEFAULT_SEED = 42
+
+
+def _env_int(name, default):
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name, '').strip().lower()
+    if not value:
+        return default
+    return value in ('1', 'true', 'yes', 'on')
+
+
+def load_run_config():
+    """
+    Read the run configuration from the environment.
+
+    Returns a plain dict so it can be dumped straight into model_metadata.json.
+    """
+    config = {
+        'seed': _env_int('PLANT_SEED', DEFAULT_SEED),
+        'intra_op_threads': _env_int('PLANT_INTRA_OP_THREADS', 0),
+        'inter_op_threads': _env_int('PLANT_INTER_OP_THREADS', 0),
+        'deterministic': _env_bool('PLANT_DETERMINISTIC', False),
+    }
+
+    for key in ('intra_op_threads', 'inter_op_threads'):
+        if config[key] < 0:
+            raise ValueError(f"{key} must be >= 0, got {config[key]}")
+
+    return config
+
+
+def apply_run_config(config, tf):
+    """
+    Seed Python/NumPy/TensorFlow and configure TF threading.
+
+    `tf` is passed in so this module stays importable without TensorFlow.
+    Returns the config extended with the effective values TF reports.
+    """
+    seed = config['seed']
+
+    random.seed(seed)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+
+    tf.config.threading.set_intra_op_parallelism_threads(config['intra_op_threads'])
+    tf.config.threading.set_inter_op_parallelism_threads(config['inter_op_threads'])
+
+    if config['deterministic']:
+        tf.config.experimental.enable_op_determinism()
+
+    applied = dict(config)
+    applied['effective_intra_op_threads'] = tf.config.threading.get_intra_op_parallelism_threads()
+    applied['effective_inter_op_threads'] = tf.config.threading.get_inter_op_parallelism_threads()
+    applied['python_hash_seed'] = os.environ.get('PYTHONHASHSEED')
+    applied['cpu_count'] = os.cpu_count()
+    applied['tensorflow_version'] = tf.__version__
+    applied['numpy_version'] = np.__version__
+
+    return applied
+
+
+def _threads_label(n):
+    return 'TF default' if n == 0 else n
+
+
+def print_run_config(config):
+    print("⚙️  Run configuration:")
+    print(f"  Seed:              {config['seed']}")
+    print(f"  Intra-op threads:  {_threads_label(config['intra_op_threads'])}")
+    print(f"  Inter-op threads:  {_threads_label(config['inter_op_threads'])}")
+    print(f"  Deterministic ops: {'ON' if config['deterministic'] else 'OFF'}")
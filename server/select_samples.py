@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# ============================================
+# SELECT_SAMPLES.PY
+# Active-Learning Queue for AI Labeling
+# ============================================
+#
+# Scores unlabeled sensor readings with the current model and ranks them
+# by uncertainty and diversity, so only the readings that teach the model
+# something new are sent to the (slow, paid) AI analysis.
+#
+# Usage:
+#   python select_samples.py readings.csv [--top-k 20] [--output labeling_queue.csv]
+#                            [--model-dir models/plant-model] [--scaler scaler_params.json]
+#                            [--metadata model_metadata.json]
+#
+# The defaults match where retrain_model.py writes the deployed model; pass
+# all three together when scoring with another model.
+#
+# Input may be a CSV or a JSON export (list of rows, or {"data": [...]})
+# with the FEATURE_NAMES columns. Rows already present in
+# ai_training_data.csv are skipped.
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from feature_schema import FEATURE_NAMES, clean_dataframe, build_feature_matrix, print_validation_report
+
+
+def load_readings(path):
+    if path.endswith('.json'):
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('data', [])
+        return pd.DataFrame(data)
+    return pd.read_csv(path)
+
+
+def drop_labeled(df, labeled_path):
+    """Remove readings whose features already appear in the labeled dataset."""
+    if not os.path.exists(labeled_path):
+        return df
+    # Same validation + dtype casts as the readings, so exact matches line up
+    labeled, _ = clean_dataframe(pd.read_csv(labeled_path), drop_saturated=False, require_label=False)
+    labeled = labeled[FEATURE_NAMES].drop_duplicates()
+    merged = df.merge(labeled, on=FEATURE_NAMES, how='left', indicator=True)
+    return df.loc[(merged['_merge'] == 'left_only').to_numpy()]
+
+
+def score_in_batches(predict_fn, X, batch_size=1024):
+    """Run predict_fn over X in fixed-size chunks to bound peak memory."""
+    scores = np.empty(len(X), dtype=np.float64)
+    for start in range(0, len(X), batch_size):
+        stop = start + batch_size
+        scores[start:stop] = np.asarray(predict_fn(X[start:stop])).reshape(-1)
+    return scores
+
+
+def uncertainty_scores(prob, threshold=0.5):
+    """
+    1.0 at the decision threshold, 0.0 at a confident 0 or 1.
+
+    Distances are normalized separately on each side of the threshold,
+    so a non-0.5 threshold still maps the full range to [0, 1].
+    """
+    prob = np.asarray(prob, dtype=np.float64)
+    below = prob < threshold
+    distance = np.where(
+        below,
+        (threshold - prob) / threshold,
+        (prob - threshold) / (1.0 - threshold)
+    )
+    return 1.0 - np.clip(distance, 0.0, 1.0)
+
+
+def select_diverse(X, uncertainty, k, candidate_factor=5):
+    """
+    Greedy uncertainty-weighted farthest-point selection.
+
+    The most uncertain k * candidate_factor readings form the pool; each
+    step picks the reading maximizing uncertainty * distance to the
+    closest already-selected reading, so near-duplicates (the same pot
+    reported every few seconds) are not queued twice.
+
+    Returns:
+        indices into X, in selection order
+    """
+    n = len(X)
+    k = min(k, n)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    pool_size = min(n, k * candidate_factor)
+    pool = np.argpartition(-uncertainty, pool_size - 1)[:pool_size]
+    X_pool = np.asarray(X, dtype=np.float64)[pool]
+    u_pool = uncertainty[pool]
+
+    selected = [int(np.argmax(u_pool))]
+    min_dist = np.linalg.norm(X_pool - X_pool[selected[0]], axis=1)
+
+    for _ in range(1, k):
+        scale = min_dist.max()
+        if scale == 0:
+            break
+        gain = u_pool * (min_dist / scale)
+        gain[selected] = -1.0
+        pick = int(np.argmax(gain))
+        selected.append(pick)
+        min_dist = np.minimum(min_dist, np.linalg.norm(X_pool - X_pool[pick], axis=1))
+
+    return pool[np.asarray(selected)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rank unlabeled readings for AI labeling')
+    parser.add_argument('readings', help='CSV or JSON file with unlabeled readings')
+    parser.add_argument('--output', default='labeling_queue.csv')
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--model-dir', default='models/plant-model')
+    parser.add_argument('--scaler', default='scaler_params.json', help='scaler_params.json of --model-dir')
+    parser.add_argument('--metadata', default='model_metadata.json', help='model_metadata.json of --model-dir')
+    parser.add_argument('--labeled', default='ai_training_data.csv')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🎯 Active-Learning Sample Selection")
+    print("=" * 70)
+
+    df = load_readings(args.readings)
+    print(f"📂 Loaded {len(df)} readings from {args.readings}")
+
+    df, validation_report = clean_dataframe(df, require_label=False)
+    print_validation_report(validation_report)
+
+    df = drop_labeled(df.drop_duplicates(subset=FEATURE_NAMES), args.labeled)
+    print(f"📊 Unlabeled unique readings: {len(df)}")
+
+    if len(df) == 0:
+        print("⚠️  Nothing to select.")
+        sys.exit(0)
+
+    with open(args.scaler) as f:
+        scaler_params = json.load(f)
+
+    threshold = 0.5
+    if os.path.exists(args.metadata):
+        with open(args.metadata) as f:
+            threshold = json.load(f).get('threshold', 0.5)
+    else:
+        print(f"⚠️  {args.metadata} not found; using threshold 0.5")
+
+    derived = len(scaler_params['feature_names']) > len(FEATURE_NAMES)
+    X, _ = build_feature_matrix(df, derived=derived)
+    X_scaled = (X - np.asarray(scaler_params['mean'])) / np.asarray(scaler_params['scale'])
+
+    import tensorflowjs as tfjs
+    model = tfjs.converters.load_keras_model(os.path.join(args.model_dir, 'model.json'))
+    if model.input_shape[-1] != X_scaled.shape[1]:
+        parser.error(f"{args.model_dir} expects {model.input_shape[-1]} inputs but {args.scaler} "
+                     f"has {X_scaled.shape[1]} features; pass the matching --scaler/--metadata")
+
+    prob = score_in_batches(
+        lambda batch: model.predict(batch, batch_size=args.batch_size, verbose=0),
+        X_scaled,
+        batch_size=args.batch_size
+    )
+    uncertainty = uncertainty_scores(prob, threshold)
+    picked = select_diverse(X_scaled, uncertainty, args.top_k)
+
+    queue = df.iloc[picked][FEATURE_NAMES].copy()
+    queue['model_score'] = prob[picked]
+    queue['uncertainty'] = uncertainty[picked]
+    queue['priority'] = np.arange(1, len(picked) + 1)
+    queue.to_csv(args.output, index=False)
+
+    print(f"\n✅ Queued {len(queue)} of {len(df)} readings for AI labeling: {args.output}")
+    print(f"   Mean uncertainty (queued): {queue['uncertainty'].mean():.3f}")
+    print(f"   Mean uncertainty (all):    {uncertainty.mean():.3f}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@ export const config = {
         TRAINING_DATA: path.join(__dirname, '../../ai_training_data.csv'),
         LAST_WATERING: path.join(__dirname, '../../last_watering.json'),
         SCALER_PARAMS: path.join(__dirname, '../../scaler_params.json'),
+        MODEL_METADATA: path.join(__dirname, '../../model_metadata.json'),
         PYTHON_SCRIPT: path.join(__dirname, '../../retrain_model.py'),
     }
 };
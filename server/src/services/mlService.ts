@@ -4,9 +4,29 @@ import path from 'path';
 import { config } from '../config/config';
 import { MLPrediction, AIAnalysisResult } from '../types';
 
+type RawFeatures = { moisture: number; hour: number; daysSinceWater: number; temperature: number; airHumidity: number };
+
+// Mirrors FEATURE_NAMES + DERIVED_FEATURE_NAMES in feature_schema.py
+const FEATURE_BUILDERS: Record<string, (f: RawFeatures) => number> = {
+    moisture: (f) => f.moisture,
+    hour: (f) => f.hour,
+    days_since_water: (f) => f.daysSinceWater,
+    temperature: (f) => f.temperature,
+    air_humidity: (f) => f.airHumidity,
+    hour_sin: (f) => Math.sin(2 * Math.PI * f.hour / 24),
+    hour_cos: (f) => Math.cos(2 * Math.PI * f.hour / 24),
+    // Vapour pressure deficit (kPa), Tetens equation
+    vpd_kpa: (f) => 0.6108 * Math.exp(17.27 * f.temperature / (f.temperature + 237.3)) * (1 - f.airHumidity / 100)
+};
+const RAW_FEATURE_NAMES = ['moisture', 'hour', 'days_since_water', 'temperature', 'air_humidity'];
+
 export class MLService {
     private model: any | null = null;
     private scalerParams: any = null;
+    private featureNames: string[] = RAW_FEATURE_NAMES;
+    private threshold: number = 0.5;
+    private calibratedThreshold: number = 0.5;
+    private calibration: any = null;
     private predictions: MLPrediction[] = [];
 
     constructor() {
@@ -27,14 +47,29 @@ export class MLService {
             const modelUrl = `http://localhost:${config.PORT}/models/plant-model/model.json`;
             console.log('🔄 Loading ML model from:', modelUrl);
 
+            const model = await tf.loadLayersModel(modelUrl);
+            const scalerParams = this.readScalerParams();
+            const featureNames: string[] = scalerParams.feature_names || RAW_FEATURE_NAMES;
+
+            // Refuse a model whose inputs this server cannot build (keeps the previous one)
+            const unknown = featureNames.filter((name) => !FEATURE_BUILDERS[name]);
+            const inputSize = model.inputs[0].shape[1];
+            if (unknown.length > 0 || inputSize !== featureNames.length || scalerParams.mean.length !== featureNames.length) {
+                model.dispose();
+                console.error(`❌ Model rejected: expects ${inputSize} inputs, scaler has [${featureNames.join(', ')}]` +
+                    (unknown.length > 0 ? `, unknown features: ${unknown.join(', ')}` : ''));
+                return false;
+            }
+
             if (this.model) {
                 this.model.dispose();
             }
+            this.model = model;
+            this.scalerParams = scalerParams;
+            this.featureNames = featureNames;
+            console.log(`✅ ML Model loaded successfully (${featureNames.length} inputs)`);
 
-            this.model = await tf.loadLayersModel(modelUrl);
-            console.log('✅ ML Model loaded successfully');
-
-            this.loadScalerParams();
+            this.loadModelMetadata();
             return true;
         } catch (error: any) {
             console.error('❌ Model loading failed:', error.message);
@@ -42,16 +77,60 @@ export class MLService {
         }
     }
 
-    private loadScalerParams() {
+    private readScalerParams(): any {
         if (fs.existsSync(config.PATHS.SCALER_PARAMS)) {
-            this.scalerParams = JSON.parse(fs.readFileSync(config.PATHS.SCALER_PARAMS, 'utf8'));
             console.log('✅ Scaler parameters loaded');
-        } else {
-            this.scalerParams = {
-                mean: [50.0, 11.5, 3.5, 25.0, 60.0],
-                scale: [28.87, 6.93, 2.02, 5.77, 17.32]
-            };
+            return JSON.parse(fs.readFileSync(config.PATHS.SCALER_PARAMS, 'utf8'));
         }
+        return {
+            mean: [50.0, 11.5, 3.5, 25.0, 60.0],
+            scale: [28.87, 6.93, 2.02, 5.77, 17.32]
+        };
+    }
+
+    private loadModelMetadata() {
+        // Threshold + calibration are computed once at train time (calibration.py)
+        this.threshold = 0.5;
+        this.calibration = null;
+        this.calibratedThreshold = 0.5;
+        if (fs.existsSync(config.PATHS.MODEL_METADATA)) {
+            const metadata = JSON.parse(fs.readFileSync(config.PATHS.MODEL_METADATA, 'utf8'));
+            if (typeof metadata.threshold === 'number') {
+                this.threshold = metadata.threshold;
+            }
+            this.calibration = metadata.calibration || null;
+
+            // Same operating point expressed as a calibrated probability (used by hybridPrediction)
+            const point = metadata.operating_points?.[metadata.default_operating_point];
+            this.calibratedThreshold = typeof point?.calibrated_threshold === 'number'
+                ? point.calibrated_threshold
+                : this.calibrate(this.threshold);
+            console.log(`✅ Model metadata loaded (threshold: ${this.threshold.toFixed(4)}, calibration: ${this.calibration?.method || 'none'})`);
+        }
+    }
+
+    private calibrate(score: number): number {
+        const calibration = this.calibration;
+        if (!calibration) return score;
+
+        if (calibration.method === 'platt') {
+            const p = Math.min(Math.max(score, 1e-7), 1 - 1e-7);
+            const z = calibration.a * Math.log(p / (1 - p)) + calibration.b;
+            return 1 / (1 + Math.exp(-z));
+        }
+
+        if (calibration.method === 'isotonic') {
+            const xs: number[] = calibration.x;
+            const ys: number[] = calibration.y;
+            if (score <= xs[0]) return ys[0];
+            if (score >= xs[xs.length - 1]) return ys[ys.length - 1];
+            let i = 1;
+            while (xs[i] < score) i++;
+            const t = (score - xs[i - 1]) / (xs[i] - xs[i - 1]);
+            return ys[i - 1] + t * (ys[i] - ys[i - 1]);
+        }
+
+        return score;
     }
 
     private normalizeFeatures(features: number[]): number[] {
@@ -64,7 +143,8 @@ export class MLService {
             throw new Error('ML model not loaded');
         }
 
-        const features = [moisture, hour, daysSinceWater, temperature, airHumidity];
+        const raw: RawFeatures = { moisture, hour, daysSinceWater, temperature, airHumidity };
+        const features = this.featureNames.map((name) => FEATURE_BUILDERS[name](raw));
         const normalized = this.normalizeFeatures(features);
 
         try {
@@ -78,8 +158,9 @@ export class MLService {
 
             const result: MLPrediction = {
                 score: score,
-                needs_water: score > 0.5,
-                confidence: score * 100,
+                needs_water: score > this.threshold,
+                confidence: this.calibrate(score) * 100,
+                threshold: this.threshold,
                 features: { moisture, hour, daysSinceWater, temperature, airHumidity }
             };
 
@@ -136,20 +217,24 @@ export class MLService {
         const mlWeight = 0.7;
         const aiWeight = 0.3;
         const mlScore = mlPrediction.score;
+        // Blend the calibrated ML probability so the operating point's calibrated threshold applies
+        const mlProbability = this.calibrate(mlScore);
         const aiScore = aiNeedsWater ? aiConfidence : (1 - aiConfidence);
-        const hybridScore = (mlScore * mlWeight) + (aiScore * aiWeight);
+        const hybridScore = (mlProbability * mlWeight) + (aiScore * aiWeight);
 
         return {
             score: hybridScore,
-            needs_water: hybridScore > 0.5,
+            needs_water: hybridScore > this.calibratedThreshold,
             confidence: hybridScore * 100,
+            threshold: this.calibratedThreshold,
             features: mlPrediction.features,
             method: 'hybrid_ml_ai',
             ai_adjusted: true,
             ml_prediction: {
                 score: mlScore,
                 needs_water: mlPrediction.needs_water,
-                confidence: mlPrediction.confidence
+                confidence: mlPrediction.confidence,
+                threshold: this.threshold
             },
             ai_assessment: {
                 needs_water: aiNeedsWater,
@@ -33,6 +33,7 @@ export interface MLPrediction {
         temperature: number;
         airHumidity: number;
     };
+    threshold?: number;
     method?: string;
     ai_adjusted?: boolean;
     ml_prediction?: any;
@@ -6,12 +6,28 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import matplotlib.pyplot as plt
 import json
+import os
+import sys
 from datetime import datetime
 
+# Shared training helpers live next to retrain_model.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+from run_config import load_run_config, apply_run_config, print_run_config
+from calibration import evaluate_operating_points
+from feature_schema import (
+    FEATURE_NAMES, LABEL_NAME, derived_features_enabled,
+    clean_dataframe, build_feature_matrix, print_validation_report
+)
+
+# Seed + thread pools must be set before TensorFlow runs any op
+run_config = apply_run_config(load_run_config(), tf)
+
 print("=" * 60)
 print("Smart Plant ML Model Training")
 print("=" * 60)
 print(f"TensorFlow Version: {tf.__version__}\n")
+print_run_config(run_config)
+print()
 # ==================================================================
 
 # GENERATE TRAINING DATA
@@ -74,14 +90,11 @@ def generate_plant_data(num_samples=3000):
             needs_water
         ])
     
-    df = pd.DataFrame(data, columns=[
-        'moisture', 'hour', 'days_since_water', 
-        'temperature', 'air_humidity', 'needs_water'
-    ])
+    df = pd.DataFrame(data, columns=FEATURE_NAMES + [LABEL_NAME])
     
     print(f"Generated {len(df)} samples")
     print(f"\nClass distribution:")
-    print(df['needs_water'].value_counts())
+    print(df[LABEL_NAME].value_counts())
     print(f"\nSample data:")
     print(df.head(10))
     
@@ -102,13 +115,19 @@ print("\n" + "=" * 60)
 print("Preparing data for training...")
 print("=" * 60)
 
+# Validate against the shared schema
+df, validation_report = clean_dataframe(df)
+print_validation_report(validation_report)
+print()
+
 # Split features and labels
-X = df[['moisture', 'hour', 'days_since_water', 'temperature', 'air_humidity']].values
-y = df['needs_water'].values
+use_derived_features = derived_features_enabled()
+X, feature_names = build_feature_matrix(df, derived=use_derived_features)
+y = df[LABEL_NAME].values
 
 # Split train/test
 X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
+    X, y, test_size=0.2, random_state=run_config['seed'], stratify=y
 )
 
 # Normalize features
@@ -123,7 +142,7 @@ print(f"Testing samples: {len(X_test)}")
 scaler_params = {
     'mean': scaler.mean_.tolist(),
     'scale': scaler.scale_.tolist(),
-    'feature_names': ['moisture', 'hour', 'days_since_water', 'temperature', 'air_humidity']
+    'feature_names': feature_names
 }
 
 with open('scaler_params.json', 'w') as f:
@@ -141,7 +160,7 @@ print("Building neural network model...")
 print("=" * 60)
 
 model = keras.Sequential([
-    keras.layers.Input(shape=(5,)),
+    keras.layers.Input(shape=(len(feature_names),)),
     keras.layers.Dense(32, activation='relu', name='layer_1'),
     keras.layers.Dropout(0.3),
     keras.layers.Dense(16, activation='relu', name='layer_2'),
@@ -167,6 +186,9 @@ print("\n" + "=" * 60)
 print("Training model...")
 print("=" * 60)
 
+# Fraction of training rows Keras holds out (also used for calibration)
+VALIDATION_SPLIT = 0.2
+
 # Callbacks
 early_stop = keras.callbacks.EarlyStopping(
     monitor='val_loss',
@@ -186,7 +208,7 @@ reduce_lr = keras.callbacks.ReduceLROnPlateau(
 # Train
 history = model.fit(
     X_train_scaled, y_train,
-    validation_split=0.2,
+    validation_split=VALIDATION_SPLIT,
     epochs=100,
     batch_size=32,
     callbacks=[early_stop, reduce_lr],
@@ -211,15 +233,22 @@ test_acc = test_results[1]
 test_precision = test_results[2]
 test_recall = test_results[3]
 
-print(f"\nTest Results:")
-print(f"  Accuracy:  {test_acc:.4f} ({test_acc*100:.2f}%)")
-print(f"  Precision: {test_precision:.4f}")
-print(f"  Recall:    {test_recall:.4f}")
+print(f"\nTest Results (Keras, threshold 0.5):")
+print(f"  Accuracy@0.5:  {test_acc:.4f} ({test_acc*100:.2f}%)")
+print(f"  Precision@0.5: {test_precision:.4f}")
+print(f"  Recall@0.5:    {test_recall:.4f}")
 print(f"  Loss:      {test_loss:.4f}")
 
-# Predictions
-y_pred_prob = model.predict(X_test_scaled, verbose=0)
-y_pred = (y_pred_prob > 0.5).astype(int)
+threshold_result, y_pred_prob, _ = evaluate_operating_points(
+    lambda X: model.predict(X, verbose=0),
+    X_train_scaled, y_train, X_test_scaled, y_test, VALIDATION_SPLIT
+)
+decision_threshold = threshold_result['threshold']
+test_acc = threshold_result['test_metrics']['accuracy']
+test_precision = threshold_result['test_metrics']['precision']
+test_recall = threshold_result['test_metrics']['recall']
+
+y_pred = (y_pred_prob > decision_threshold).astype(int)
 
 # Confusion Matrix
 from sklearn.metrics import confusion_matrix, classification_report
@@ -305,11 +334,20 @@ metadata = {
     'precision': float(test_precision),
     'recall': float(test_recall),
     'loss': float(test_loss),
-    'features': ['moisture', 'hour', 'days_since_water', 'temperature', 'air_humidity'],
-    'input_shape': [1, 5],
+    'features': feature_names,
+    'derived_features': use_derived_features,
+    'validation': validation_report,
+    'input_shape': [1, len(feature_names)],
     'output_shape': [1, 1],
-    'threshold': 0.5,
-    'model_type': 'binary_classification'
+    'threshold': decision_threshold,
+    'metrics_at_0_5': threshold_result['metrics_at_0_5'],
+    'default_operating_point': threshold_result['default_operating_point'],
+    'operating_points': threshold_result['operating_points'],
+    'calibration': threshold_result['calibration'],
+    'calibration_samples': threshold_result['held_out_samples'],
+    'calibration_fallback': threshold_result['fallback_reason'],
+    'model_type': 'binary_classification',
+    'run_config': run_config
 }
 
 with open('model_metadata.json', 'w') as f:
@@ -355,18 +393,12 @@ print("\nPrediction Examples:")
 print("=" * 70)
 
 for scenario in scenarios:
-    input_data = np.array([[
-        scenario['moisture'],
-        scenario['hour'],
-        scenario['days_since_water'],
-        scenario['temperature'],
-        scenario['air_humidity']
-    ]])
+    input_data, _ = build_feature_matrix(pd.DataFrame([scenario]), derived=use_derived_features)
     
     input_scaled = scaler.transform(input_data)
     prediction = model.predict(input_scaled, verbose=0)[0][0]
     
-    needs_water = "YA" if prediction > 0.5 else "TIDAK"
+    needs_water = "YA" if prediction > decision_threshold else "TIDAK"
     
     print(f"\n{scenario['name']}:")
     print(f"  Kelembaban: {scenario['moisture']}% | Jam: {scenario['hour']}:00")